@@ -1,58 +1,202 @@
 import os
-import json
-from datetime import datetime, timedelta
-import pytz
+import logging
+import secrets
+import signal
+import warnings
+from datetime import datetime, date, time, timedelta
+from zoneinfo import ZoneInfo
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
-from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters, ConversationHandler
+from telegram.ext import AIORateLimiter, Application, CommandHandler, ContextTypes, MessageHandler, filters, ConversationHandler
+from telegram.warnings import PTBUserWarning
 import asyncio
 from aiohttp import web
+from storage import open_db, close_db, load_reminders, add_reminder, remove_reminder, mark_sent
+
+log = logging.getLogger(__name__)
+
+# run_daily warns about the v20 change to `days` numbering on every call;
+# schedule_reminder already uses the new numbering (1 is Monday)
+warnings.filterwarnings("ignore", message="Prior to v20.0 the `days` parameter", category=PTBUserWarning)
 
 # Singapore timezone
-SGT = pytz.timezone('Asia/Singapore')
+SGT = ZoneInfo('Asia/Singapore')
+
+# Public URL for Telegram to post updates to (Render sets RENDER_EXTERNAL_URL).
+# Without one the bot falls back to polling, e.g. when running locally.
+PUBLIC_URL = os.getenv('WEBHOOK_URL') or os.getenv('RENDER_EXTERNAL_URL')
+
+# Secret webhook path, also sent back by Telegram in a header on every update
+SECRET = os.getenv('WEBHOOK_SECRET') or secrets.token_urlsafe(24)
+
+# Opening of every reminder message
+REMINDER_INTRO = "Attention Warrior Erin! Remember to take a break a little, smile and think of the positive things~ Here are the side quests that you need to complete before you get back on with your day, my love :)\n\n"
+
+# Keyboards are the same for every message, so build them once
+MAIN_MENU = ReplyKeyboardMarkup([
+    ['1. Add Reminder'],
+    ['2. See List'],
+    ['3. Remove Reminder']
+], resize_keyboard=True)
 
-# Store reminders in a JSON file
-REMINDERS_FILE = 'reminders.json'
+FREQUENCY_KEYBOARD = ReplyKeyboardMarkup([
+    ['Daily'],
+    ['Weekly'],
+    ['Monthly'],
+    ['One-off']
+], resize_keyboard=True, one_time_keyboard=True)
+
+START_DATE_KEYBOARD = ReplyKeyboardMarkup([
+    ['Today'],
+    ['Tomorrow'],
+    ['Custom Date']
+], resize_keyboard=True, one_time_keyboard=True)
+
+END_DATE_KEYBOARD = ReplyKeyboardMarkup([
+    ['Never'],
+    ['1 Week'],
+    ['1 Month'],
+    ['3 Months'],
+    ['6 Months'],
+    ['1 Year'],
+    ['Custom Date']
+], resize_keyboard=True, one_time_keyboard=True)
+
+# Menu button patterns, shared by the handlers and the catch-all filter
+ADD_PATTERN = r'^1\.|^Add'
+LIST_PATTERN = r'^2\.|^See|^List'
+REMOVE_PATTERN = r'^3\.|^Remove'
+MENU_PATTERN = f'{ADD_PATTERN}|{LIST_PATTERN}|{REMOVE_PATTERN}'
 
 # Conversation states
 TASK, FREQUENCY, TIME, START_DATE, END_DATE, ONE_OFF_DATETIME = range(6)
 REMOVE_NUMBER = 0
 
-def load_reminders():
-    """Load reminders from JSON file"""
-    if os.path.exists(REMINDERS_FILE):
-        with open(REMINDERS_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+# Parsers for the fixed formats the bot uses. The common, exactly formatted
+# input is handled with plain slicing; anything else falls back to strptime,
+# which accepts what it always did or raises the usual ValueError.
+def parse_hhmm(text):
+    """Parse HH:MM into a time"""
+    if len(text) == 5 and text[2] == ':' and text[:2].isdecimal() and text[3:].isdecimal():
+        hour, minute = int(text[:2]), int(text[3:])
+        if hour < 24 and minute < 60:
+            return time(hour, minute)
+    return datetime.strptime(text, "%H:%M").time()
+
+def parse_ymd(text):
+    """Parse YYYY-MM-DD into a date"""
+    if (len(text) == 10 and text[4] == '-' and text[7] == '-'
+            and text[:4].isdecimal() and text[5:7].isdecimal() and text[8:].isdecimal()):
+        try:
+            return date(int(text[:4]), int(text[5:7]), int(text[8:]))
+        except ValueError:
+            pass
+    return datetime.strptime(text, "%Y-%m-%d").date()
+
+def parse_ymd_hhmm(text):
+    """Parse YYYY-MM-DD HH:MM into a (naive) datetime"""
+    if len(text) == 16 and text[10] == ' ':
+        try:
+            return datetime.combine(parse_ymd(text[:10]), parse_hhmm(text[11:]))
+        except ValueError:
+            pass
+    return datetime.strptime(text, "%Y-%m-%d %H:%M")
 
-def save_reminders(reminders):
-    """Save reminders to JSON file"""
-    with open(REMINDERS_FILE, 'w') as f:
-        json.dump(reminders, f, indent=2)
+def parse_reminder_dates(reminder):
+    """Attach parsed dates and times to a reminder so they are only parsed once
+    
+    The parsed values live under keys starting with '_' and are never saved.
+    """
+    if reminder['frequency'] == 'One-off':
+        reminder['_datetime_obj'] = parse_ymd_hhmm(reminder['datetime']).replace(tzinfo=SGT)
+    else:
+        reminder['_time_obj'] = parse_hhmm(reminder['time']).replace(tzinfo=SGT)
+        reminder['_start_date_obj'] = parse_ymd(reminder['start_date'])
+        if reminder['end_date']:
+            reminder['_end_date_obj'] = parse_ymd(reminder['end_date'])
+        else:
+            reminder['_end_date_obj'] = None
+
+# Global reminders storage, filled from the database in post_init
+reminders = {}
+
+# Cached 'See List' messages per user, dropped whenever their reminders change
+rendered_lists = {}
+
+def parse_all_reminders():
+    """Parse dates of all loaded reminders"""
+    for user_reminders in reminders.values():
+        for reminder in user_reminders:
+            parse_reminder_dates(reminder)
 
-# Global reminders storage
-reminders = load_reminders()
+# Health check (and webhook) web server for Render, started in post_init
+web_runner = None
+
+async def health_check(request):
+    return web.Response(text="Bot is running!")
+
+async def start_web_server(app: Application):
+    """Start the web server on $PORT"""
+    global web_runner
+    
+    async def telegram_webhook(request):
+        if request.headers.get('X-Telegram-Bot-Api-Secret-Token') != SECRET:
+            return web.Response(status=403)
+        if not app.running:
+            # Nothing would process it; make Telegram retry later
+            return web.Response(status=503)
+        data = await request.json()
+        await app.update_queue.put(Update.de_json(data, app.bot))
+        return web.Response()
+    
+    web_app = web.Application()
+    web_app.router.add_get('/', health_check)
+    web_app.router.add_get('/health', health_check)
+    if PUBLIC_URL:
+        web_app.router.add_post(f'/{SECRET}', telegram_webhook)
+    web_runner = web.AppRunner(web_app)
+    await web_runner.setup()
+    port = int(os.getenv('PORT', 10000))
+    site = web.TCPSite(web_runner, '0.0.0.0', port)
+    await site.start()
+    log.info("🌐 Web server running on port %s", port)
+
+async def stop_web_server():
+    """Stop the web server, if it is running"""
+    global web_runner
+    
+    if web_runner is not None:
+        await web_runner.cleanup()
+        web_runner = None
+
+async def post_init(app: Application):
+    """Load and schedule reminders, then start the web server"""
+    await open_db()
+    reminders.update(await load_reminders())
+    parse_all_reminders()
+    schedule_all_reminders(app.job_queue)
+    
+    # Runs on the application's own event loop, whether polling or webhook
+    await start_web_server(app)
+
+async def post_shutdown(app: Application):
+    """Stop the web server and close the database when the bot stops"""
+    await stop_web_server()
+    await close_db()
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Send welcome message with main menu"""
     # Clear any ongoing conversation data
     context.user_data.clear()
     
-    keyboard = [
-        ['1. Add Reminder'],
-        ['2. See List'],
-        ['3. Remove Reminder']
-    ]
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
-    
     await update.message.reply_text(
         "Hello Princess Erin <3 I hope this helps you make your life easier and remind of you the important things you need to do. Ready to nudge when you need a little reminder or a little smile! :)\n\n"
         "Choose an option below:",
-        reply_markup=reply_markup
+        reply_markup=MAIN_MENU
     )
 
 async def handle_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle menu selections"""
-    text = update.message.text
+    """Handle any other text: show the menu once, then ask to use it"""
+    # Menu buttons never get here, the catch-all handler filters them out
     
     # Show welcome menu if user just sent any text and hasn't seen menu yet
     if not context.user_data.get('menu_shown'):
@@ -60,12 +204,6 @@ async def handle_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await start(update, context)
         return
     
-    # Don't process if it matches a menu button (let other handlers deal with it)
-    if text.startswith('1.') or text.startswith('2.') or text.startswith('3.'):
-        return
-    if 'Add' in text or 'See' in text or 'List' in text or 'Remove' in text:
-        return
-    
     await update.message.reply_text("Please choose one of the options from the menu.")
 
 # ADD REMINDER FLOW
@@ -81,17 +219,9 @@ async def get_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Save task and ask for frequency"""
     context.user_data['task'] = update.message.text
     
-    keyboard = [
-        ['Daily'],
-        ['Weekly'],
-        ['Monthly'],
-        ['One-off']
-    ]
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
-    
     await update.message.reply_text(
         "📅 How often should I remind you?",
-        reply_markup=reply_markup
+        reply_markup=FREQUENCY_KEYBOARD
     )
     return FREQUENCY
 
@@ -100,14 +230,7 @@ async def get_frequency(update: Update, context: ContextTypes.DEFAULT_TYPE):
     frequency = update.message.text.strip()
     
     if frequency not in ['Daily', 'Weekly', 'Monthly', 'One-off']:
-        keyboard = [
-            ['Daily'],
-            ['Weekly'],
-            ['Monthly'],
-            ['One-off']
-        ]
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
-        await update.message.reply_text("Please choose: Daily, Weekly, Monthly, or One-off", reply_markup=reply_markup)
+        await update.message.reply_text("Please choose: Daily, Weekly, Monthly, or One-off", reply_markup=FREQUENCY_KEYBOARD)
         return FREQUENCY
     
     context.user_data['frequency'] = frequency
@@ -138,7 +261,7 @@ async def get_one_off_datetime(update: Update, context: ContextTypes.DEFAULT_TYP
     
     try:
         # Validate datetime format
-        reminder_datetime = datetime.strptime(datetime_str, "%Y-%m-%d %H:%M")
+        reminder_datetime = parse_ymd_hhmm(datetime_str)
         
         # Check if date is in the future (Singapore time)
         now_sgt = datetime.now(SGT).replace(tzinfo=None)
@@ -159,7 +282,7 @@ async def get_one_off_datetime(update: Update, context: ContextTypes.DEFAULT_TYP
         return ONE_OFF_DATETIME
     
     # Save the one-off reminder
-    user_id = str(update.effective_user.id)
+    user_id = update.effective_user.id
     
     if user_id not in reminders:
         reminders[user_id] = []
@@ -172,25 +295,23 @@ async def get_one_off_datetime(update: Update, context: ContextTypes.DEFAULT_TYP
     }
     
     reminders[user_id].append(new_reminder)
-    save_reminders(reminders)
+    rendered_lists.pop(user_id, None)
+    parse_reminder_dates(new_reminder)
+    schedule_reminder(context.job_queue, user_id, new_reminder)
     
     # Show confirmation
-    keyboard = [
-        ['1. Add Reminder'],
-        ['2. See List'],
-        ['3. Remove Reminder']
-    ]
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-    
     await update.message.reply_text(
         f"✅ Reminder added!\n\n"
         f"📝 Task: {new_reminder['task']}\n"
         f"📅 One-time reminder\n"
         f"🗓️ Date & Time: {datetime_str} SGT\n\n"
         f"Choose your next action:",
-        reply_markup=reply_markup
+        reply_markup=MAIN_MENU
     )
     
+    # Save after replying so the user doesn't wait on the database
+    await save_added_reminder(update, context, user_id, new_reminder)
+    
     context.user_data.clear()
     return ConversationHandler.END
 
@@ -200,7 +321,7 @@ async def get_time(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         # Validate time format
-        datetime.strptime(time_str, "%H:%M")
+        parse_hhmm(time_str)
     except ValueError:
         await update.message.reply_text(
             "❌ Invalid time format.\n\n"
@@ -210,16 +331,9 @@ async def get_time(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     context.user_data['time'] = time_str
     
-    keyboard = [
-        ['Today'],
-        ['Tomorrow'],
-        ['Custom Date']
-    ]
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
-    
     await update.message.reply_text(
         "📅 When should this reminder start?",
-        reply_markup=reply_markup
+        reply_markup=START_DATE_KEYBOARD
     )
     return START_DATE
 
@@ -243,7 +357,7 @@ async def get_start_date(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         # Custom date entered
         try:
-            datetime.strptime(date_str, "%Y-%m-%d")
+            parse_ymd(date_str)
         except ValueError:
             await update.message.reply_text(
                 "❌ Invalid date format.\n\n"
@@ -254,20 +368,9 @@ async def get_start_date(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     context.user_data['start_date'] = date_str
     
-    keyboard = [
-        ['Never'],
-        ['1 Week'],
-        ['1 Month'],
-        ['3 Months'],
-        ['6 Months'],
-        ['1 Year'],
-        ['Custom Date']
-    ]
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
-    
     await update.message.reply_text(
         "📅 When should this reminder end?",
-        reply_markup=reply_markup
+        reply_markup=END_DATE_KEYBOARD
     )
     return END_DATE
 
@@ -286,7 +389,7 @@ async def get_end_date(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return END_DATE
     elif date_str in ['1 Week', '1 Month', '3 Months', '6 Months', '1 Year']:
-        start_date = datetime.strptime(context.user_data['start_date'], "%Y-%m-%d")
+        start_date = parse_ymd(context.user_data['start_date'])
         
         if date_str == '1 Week':
             end_date = start_date + timedelta(weeks=1)
@@ -303,47 +406,27 @@ async def get_end_date(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         # Custom date entered - validate it
         try:
-            end_date = datetime.strptime(date_str, "%Y-%m-%d")
-            start_date = datetime.strptime(context.user_data['start_date'], "%Y-%m-%d")
+            end_date = parse_ymd(date_str)
+            start_date = parse_ymd(context.user_data['start_date'])
             
             if end_date <= start_date:
-                keyboard = [
-                    ['Never'],
-                    ['1 Week'],
-                    ['1 Month'],
-                    ['3 Months'],
-                    ['6 Months'],
-                    ['1 Year'],
-                    ['Custom Date']
-                ]
-                reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
                 await update.message.reply_text(
                     "❌ End date must be after start date!\n\n"
                     "Please choose again:",
-                    reply_markup=reply_markup
+                    reply_markup=END_DATE_KEYBOARD
                 )
                 return END_DATE
                 
         except ValueError:
-            keyboard = [
-                ['Never'],
-                ['1 Week'],
-                ['1 Month'],
-                ['3 Months'],
-                ['6 Months'],
-                ['1 Year'],
-                ['Custom Date']
-            ]
-            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
             await update.message.reply_text(
                 "❌ Invalid date format.\n\n"
                 "Please choose again or use format: YYYY-MM-DD",
-                reply_markup=reply_markup
+                reply_markup=END_DATE_KEYBOARD
             )
             return END_DATE
     
     # Save the reminder
-    user_id = str(update.effective_user.id)
+    user_id = update.effective_user.id
     
     if user_id not in reminders:
         reminders[user_id] = []
@@ -357,16 +440,11 @@ async def get_end_date(update: Update, context: ContextTypes.DEFAULT_TYPE):
     }
     
     reminders[user_id].append(new_reminder)
-    save_reminders(reminders)
+    rendered_lists.pop(user_id, None)
+    parse_reminder_dates(new_reminder)
+    schedule_reminder(context.job_queue, user_id, new_reminder)
     
     # Show confirmation
-    keyboard = [
-        ['1. Add Reminder'],
-        ['2. See List'],
-        ['3. Remove Reminder']
-    ]
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-    
     end_text = f"🗓️ End: {date_str}" if date_str else "🗓️ End: Never"
     
     await update.message.reply_text(
@@ -377,106 +455,96 @@ async def get_end_date(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"🗓️ Start: {new_reminder['start_date']}\n"
         f"{end_text}\n\n"
         f"Choose your next action:",
-        reply_markup=reply_markup
+        reply_markup=MAIN_MENU
     )
     
+    # Save after replying so the user doesn't wait on the database
+    await save_added_reminder(update, context, user_id, new_reminder)
+    
     context.user_data.clear()
     return ConversationHandler.END
 
 # SEE LIST
 async def see_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show all reminders"""
-    user_id = str(update.effective_user.id)
-    
-    keyboard = [
-        ['1. Add Reminder'],
-        ['2. See List'],
-        ['3. Remove Reminder']
-    ]
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    user_id = update.effective_user.id
     
     if user_id not in reminders or not reminders[user_id]:
         await update.message.reply_text(
             "You don't have any reminders yet!\n\n"
             "Use '1. Add Reminder' to create one.",
-            reply_markup=reply_markup
+            reply_markup=MAIN_MENU
         )
         return
     
-    message = "📋 Your Reminders:\n\n"
-    for i, reminder in enumerate(reminders[user_id], 1):
-        message += f"{i}. {reminder['task']}\n"
-        message += f"   📅 {reminder['frequency']}\n"
-        
-        if reminder['frequency'] == 'One-off':
-            message += f"   🗓️ {reminder['datetime']} SGT\n"
-        else:
-            message += f"   ⏰ {reminder['time']} SGT\n"
-            message += f"   🗓️ Start: {reminder['start_date']}\n"
-            end_text = reminder['end_date'] if reminder['end_date'] else 'Never'
-            message += f"   🗓️ End: {end_text}\n"
-        
-        message += "\n"
+    # Rendered once and reused until this user's reminders change
+    message = rendered_lists.get(user_id)
+    if message is None:
+        parts = ["📋 Your Reminders:\n\n"]
+        for i, reminder in enumerate(reminders[user_id], 1):
+            parts.append(f"{i}. {reminder['task']}\n")
+            parts.append(f"   📅 {reminder['frequency']}\n")
+            
+            if reminder['frequency'] == 'One-off':
+                parts.append(f"   🗓️ {reminder['datetime']} SGT\n")
+            else:
+                parts.append(f"   ⏰ {reminder['time']} SGT\n")
+                parts.append(f"   🗓️ Start: {reminder['start_date']}\n")
+                end_text = reminder['end_date'] if reminder['end_date'] else 'Never'
+                parts.append(f"   🗓️ End: {end_text}\n")
+            
+            parts.append("\n")
+        message = rendered_lists[user_id] = "".join(parts)
     
-    await update.message.reply_text(message, reply_markup=reply_markup)
+    await update.message.reply_text(message, reply_markup=MAIN_MENU)
 
 # REMOVE REMINDER FLOW
 async def remove_reminder_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start removing a reminder"""
-    user_id = str(update.effective_user.id)
+    user_id = update.effective_user.id
     
     if user_id not in reminders or not reminders[user_id]:
-        keyboard = [
-            ['1. Add Reminder'],
-            ['2. See List'],
-            ['3. Remove Reminder']
-        ]
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-        
         await update.message.reply_text(
             "You don't have any reminders to remove!",
-            reply_markup=reply_markup
+            reply_markup=MAIN_MENU
         )
         return ConversationHandler.END
     
     # Show list with numbers
-    message = "📋 Your Reminders:\n\n"
+    parts = ["📋 Your Reminders:\n\n"]
     for i, reminder in enumerate(reminders[user_id], 1):
         if reminder['frequency'] == 'One-off':
-            message += f"{i}. {reminder['task']} (One-off, {reminder['datetime']})\n"
+            parts.append(f"{i}. {reminder['task']} (One-off, {reminder['datetime']})\n")
         else:
-            message += f"{i}. {reminder['task']} ({reminder['frequency']}, {reminder['time']})\n"
+            parts.append(f"{i}. {reminder['task']} ({reminder['frequency']}, {reminder['time']})\n")
     
-    message += "\n🗑️ Which reminder would you like to remove?\n"
-    message += "Enter the number:"
+    parts.append("\n🗑️ Which reminder would you like to remove?\n")
+    parts.append("Enter the number:")
     
-    await update.message.reply_text(message, reply_markup=ReplyKeyboardRemove())
+    await update.message.reply_text("".join(parts), reply_markup=ReplyKeyboardRemove())
     return REMOVE_NUMBER
 
 async def remove_reminder_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Remove the selected reminder"""
-    user_id = str(update.effective_user.id)
+    user_id = update.effective_user.id
     
     try:
         number = int(update.message.text.strip())
         
         if 1 <= number <= len(reminders[user_id]):
             removed = reminders[user_id].pop(number - 1)
-            save_reminders(reminders)
-            
-            keyboard = [
-                ['1. Add Reminder'],
-                ['2. See List'],
-                ['3. Remove Reminder']
-            ]
-            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+            rendered_lists.pop(user_id, None)
+            unschedule_reminder(removed)
             
             await update.message.reply_text(
                 f"✅ Reminder removed!\n\n"
                 f"📝 {removed['task']}\n\n"
                 f"Choose your next action:",
-                reply_markup=reply_markup
+                reply_markup=MAIN_MENU
             )
+            
+            # Save after replying so the user doesn't wait on the database
+            await save_removed_reminder(update, context, user_id, number - 1, removed)
         else:
             await update.message.reply_text(
                 f"❌ Invalid number. Please enter a number between 1 and {len(reminders[user_id])}"
@@ -489,96 +557,152 @@ async def remove_reminder_confirm(update: Update, context: ContextTypes.DEFAULT_
     
     return ConversationHandler.END
 
+async def save_added_reminder(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id, reminder):
+    """Save a reminder the user was already told about, undoing it if that fails"""
+    try:
+        await add_reminder(user_id, reminder)
+    except Exception:
+        log.exception("Couldn't save reminder for %s", user_id)
+        reminders[user_id] = [r for r in reminders[user_id] if r is not reminder]
+        rendered_lists.pop(user_id, None)
+        unschedule_reminder(reminder)
+        await update.message.reply_text(
+            "❌ Sorry, I couldn't save that reminder. Please add it again.",
+            reply_markup=MAIN_MENU
+        )
+
+async def save_removed_reminder(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id, index, reminder):
+    """Delete a reminder the user was already told about, putting it back if that fails"""
+    try:
+        await remove_reminder(reminder)
+    except Exception:
+        log.exception("Couldn't remove reminder for %s", user_id)
+        reminders[user_id].insert(index, reminder)
+        rendered_lists.pop(user_id, None)
+        schedule_reminder(context.job_queue, user_id, reminder)
+        await update.message.reply_text(
+            "❌ Sorry, I couldn't remove that reminder, it is still on your list. Please try again.",
+            reply_markup=MAIN_MENU
+        )
+
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Cancel the current operation"""
-    keyboard = [
-        ['1. Add Reminder'],
-        ['2. See List'],
-        ['3. Remove Reminder']
-    ]
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-    
     await update.message.reply_text(
         "Operation cancelled. Choose an option:",
-        reply_markup=reply_markup
+        reply_markup=MAIN_MENU
     )
     context.user_data.clear()
     return ConversationHandler.END
 
-async def send_reminders(context: ContextTypes.DEFAULT_TYPE):
-    """Check and send reminders"""
-    # Get current Singapore time
-    now_sgt = datetime.now(SGT)
-    current_time = now_sgt.strftime("%H:%M")
-    current_date = now_sgt.strftime("%Y-%m-%d")
-    current_day = now_sgt.day
-    current_weekday = now_sgt.weekday()
-    
-    print(f"Checking reminders at {current_date} {current_time} SGT")
+def schedule_reminder(job_queue, user_id, reminder):
+    """Register a job that fires exactly when the reminder is due"""
+    # Not the task text: APScheduler logs job names. Reminders that are
+    # just being added are scheduled before they get a database id.
+    name = f"{user_id}:{reminder.get('id', 'new')}"
+    
+    if reminder['frequency'] == 'One-off':
+        if reminder.get('sent', False):
+            return
+        when = reminder['_datetime_obj']
+        if when <= datetime.now(SGT):
+            # Missed while the bot was down
+            return
+        job = job_queue.run_once(send_reminder, when=when, data=(user_id, reminder), name=name)
+    else:
+        at = reminder['_time_obj']
+        if reminder['frequency'] == 'Daily':
+            job = job_queue.run_daily(send_reminder, time=at, data=(user_id, reminder), name=name)
+        elif reminder['frequency'] == 'Weekly':
+            # JobQueue counts days from Sunday, so 1 is Monday
+            job = job_queue.run_daily(send_reminder, time=at, days=(1,), data=(user_id, reminder), name=name)
+        elif reminder['frequency'] == 'Monthly':
+            job = job_queue.run_monthly(send_reminder, when=at, day=1, data=(user_id, reminder), name=name)
+        else:
+            return
     
+    reminder['_job'] = job
+
+def unschedule_reminder(reminder):
+    """Cancel the job of a removed reminder"""
+    job = reminder.pop('_job', None)
+    if job is not None:
+        job.schedule_removal()
+
+def schedule_all_reminders(job_queue):
+    """Register jobs for all loaded reminders"""
     for user_id, user_reminders in reminders.items():
         for reminder in user_reminders:
-            should_send = False
-            
-            # Handle one-off reminders
-            if reminder['frequency'] == 'One-off':
-                if not reminder.get('sent', False):
-                    reminder_dt = datetime.strptime(reminder['datetime'], "%Y-%m-%d %H:%M")
-                    reminder_time = reminder_dt.strftime("%H:%M")
-                    reminder_date = reminder_dt.strftime("%Y-%m-%d")
-                    
-                    print(f"One-off check: {reminder_date} {reminder_time} vs {current_date} {current_time}")
-                    
-                    if current_date == reminder_date and current_time == reminder_time:
-                        should_send = True
-                        reminder['sent'] = True
-                        save_reminders(reminders)
-            
-            # Handle recurring reminders
-            else:
-                # Check if within date range
-                if current_date < reminder['start_date']:
-                    print(f"Reminder not started yet: {reminder['start_date']}")
-                    continue
-                if reminder['end_date'] and current_date > reminder['end_date']:
-                    print(f"Reminder ended: {reminder['end_date']}")
-                    continue
-                
-                # Check if it's time to send
-                if reminder['time'] == current_time:
-                    print(f"Time matches! Checking frequency: {reminder['frequency']}")
-                    if reminder['frequency'] == 'Daily':
-                        should_send = True
-                    elif reminder['frequency'] == 'Weekly' and current_weekday == 0:
-                        should_send = True
-                    elif reminder['frequency'] == 'Monthly' and current_day == 1:
-                        should_send = True
-            
-            if should_send:
-                print(f"Sending reminder to {user_id}: {reminder['task']}")
-                message = "Attention Warrior Erin! Remember to take a break a little, smile and think of the positive things~ Here are the side quests that you need to complete before you get back on with your day, my love :)\n\n"
-                message += f"⚔️ {reminder['task']}"
-                try:
-                    await context.bot.send_message(chat_id=int(user_id), text=message)
-                    print(f"✅ Reminder sent successfully!")
-                except Exception as e:
-                    print(f"❌ Error sending to {user_id}: {e}")
+            schedule_reminder(job_queue, user_id, reminder)
+
+async def send_reminder(context: ContextTypes.DEFAULT_TYPE):
+    """Send a single reminder when its job fires"""
+    user_id, reminder = context.job.data
+    today = datetime.now(SGT).date()
+    
+    # Handle one-off reminders
+    if reminder['frequency'] == 'One-off':
+        if not any(r is reminder for r in reminders.get(user_id, [])):
+            # Removed just before it was due
+            return
+        reminder['sent'] = True
+        reminder.pop('_job', None)
+        # Without an id it isn't inserted yet; the insert will save 'sent'
+        if 'id' in reminder:
+            await mark_sent(reminder)
+    
+    # Handle recurring reminders
+    else:
+        # Check if within date range
+        if today < reminder['_start_date_obj']:
+            log.debug("Reminder not started yet: %s", reminder['start_date'])
+            return
+        if reminder['_end_date_obj'] and today > reminder['_end_date_obj']:
+            log.debug("Reminder ended: %s", reminder['end_date'])
+            unschedule_reminder(reminder)
+            return
+    
+    log.debug("Sending reminder to %s: %s", user_id, reminder['task'])
+    message = f"{REMINDER_INTRO}⚔️ {reminder['task']}"
+    try:
+        await context.bot.send_message(chat_id=user_id, text=message)
+        log.debug("✅ Reminder sent successfully!")
+    except Exception as e:
+        log.error("❌ Error sending to %s: %s", user_id, e)
 
 def main():
     """Start the bot"""
+    # INFO by default; LOG_LEVEL=DEBUG shows every reminder being sent
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+        level=os.getenv('LOG_LEVEL', 'INFO').upper()
+    )
+    # httpx logs every Telegram API request at INFO
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    # APScheduler logs every job it adds and runs at INFO
+    logging.getLogger('apscheduler').setLevel(logging.WARNING)
+    
     TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
     
     if not TOKEN:
-        print("⚠️  Error: TELEGRAM_BOT_TOKEN environment variable not set!")
+        log.error("⚠️  Error: TELEGRAM_BOT_TOKEN environment variable not set!")
         return
     
     # Create application
-    app = Application.builder().token(TOKEN).build()
+    # Reminder jobs due at the same moment run concurrently; the rate
+    # limiter keeps their sends within Telegram's per-second flood limits
+    app = (
+        Application.builder()
+        .token(TOKEN)
+        .rate_limiter(AIORateLimiter())
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     
     # Add reminder conversation handler
     add_conv_handler = ConversationHandler(
         entry_points=[
-            MessageHandler(filters.Regex('^1\.|^Add'), add_reminder_start)
+            MessageHandler(filters.Regex(ADD_PATTERN), add_reminder_start)
         ],
         states={
             TASK: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_task)],
@@ -597,7 +721,7 @@ def main():
     # Remove reminder conversation handler
     remove_conv_handler = ConversationHandler(
         entry_points=[
-            MessageHandler(filters.Regex('^3\.|^Remove'), remove_reminder_start)
+            MessageHandler(filters.Regex(REMOVE_PATTERN), remove_reminder_start)
         ],
         states={
             REMOVE_NUMBER: [MessageHandler(filters.TEXT & ~filters.COMMAND, remove_reminder_confirm)],
@@ -612,38 +736,45 @@ def main():
     app.add_handler(CommandHandler("start", start))
     
     # Specific regex handlers BEFORE conversation handlers
-    app.add_handler(MessageHandler(filters.Regex('^2\.|^See|^List'), see_list))
+    app.add_handler(MessageHandler(filters.Regex(LIST_PATTERN), see_list))
     
     # Conversation handlers
     app.add_handler(add_conv_handler)
     app.add_handler(remove_conv_handler)
     
     # Catch-all handler for menu and first message - must be last
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_menu))
-    
-    # Set up job queue for reminders
-    job_queue = app.job_queue
-    job_queue.run_repeating(send_reminders, interval=60, first=10)
-    
-    print("🤖 Bot is running!")
-    
-    # Start health check web server for Render
-    async def health_check(request):
-        return web.Response(text="Bot is running!")
-    
-    async def start_web_server():
-        web_app = web.Application()
-        web_app.router.add_get('/', health_check)
-        web_app.router.add_get('/health', health_check)
-        runner = web.AppRunner(web_app)
-        await runner.setup()
-        port = int(os.getenv('PORT', 10000))
-        site = web.TCPSite(runner, '0.0.0.0', port)
-        await site.start()
-        print(f"🌐 Web server running on port {port}")
-    
-    # Start web server
-    asyncio.get_event_loop().create_task(start_web_server())
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND & ~filters.Regex(MENU_PATTERN), handle_menu))
+    
+    log.info("🤖 Bot is running!")
+    
+    async def run_webhook():
+        # Run until Render (or Ctrl+C) asks us to stop
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        
+        async with app:
+            await app.post_init(app)
+            await app.start()
+            await app.bot.set_webhook(
+                url=f"{PUBLIC_URL.rstrip('/')}/{SECRET}",
+                allowed_updates=Update.ALL_TYPES,
+                secret_token=SECRET
+            )
+            log.info("🔗 Webhook set to %s", PUBLIC_URL)
+            
+            await stop.wait()
+            
+            # Stop taking updates before the application stops processing them
+            await stop_web_server()
+            await app.stop()
+        await app.post_shutdown(app)
+    
+    if PUBLIC_URL:
+        # Telegram pushes updates to our web server, no polling needed
+        asyncio.run(run_webhook())
+        return
     
     # Run the bot
     app.run_polling(allowed_updates=Update.ALL_TYPES)
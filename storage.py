@@ -0,0 +1,196 @@
+"""Saving and loading reminders"""
+import os
+import json
+import logging
+import aiosqlite
+
+log = logging.getLogger(__name__)
+
+# Reminders live in a SQLite database, one row per reminder
+DB_FILE = 'reminders.db'
+
+# Files used before the database, imported once on first start
+LEGACY_FILE = 'reminders.json'
+LEGACY_LOG = 'reminders.log'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reminders (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    task TEXT NOT NULL,
+    frequency TEXT NOT NULL,
+    time TEXT,
+    start_date TEXT,
+    end_date TEXT,
+    one_off_dt TEXT,
+    sent INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_user ON reminders(user_id);
+"""
+
+db = None
+
+async def open_db():
+    """Open the database, creating the table on first start"""
+    global db
+    
+    db = await aiosqlite.connect(DB_FILE)
+    db.row_factory = aiosqlite.Row
+    # WAL: each change is a small append instead of rewriting pages in place
+    await db.execute("PRAGMA journal_mode=WAL")
+    await db.execute("PRAGMA synchronous=NORMAL")
+    await db.executescript(SCHEMA)
+    await db.commit()
+    await import_legacy_json()
+
+async def close_db():
+    """Close the database"""
+    global db
+    
+    if db is not None:
+        await db.close()
+        db = None
+
+def row_to_reminder(row):
+    """Turn a database row into the reminder dict used by the bot"""
+    if row['frequency'] == 'One-off':
+        return {
+            'id': row['id'],
+            'task': row['task'],
+            'frequency': 'One-off',
+            'datetime': row['one_off_dt'],
+            'sent': bool(row['sent'])
+        }
+    return {
+        'id': row['id'],
+        'task': row['task'],
+        'frequency': row['frequency'],
+        'time': row['time'],
+        'start_date': row['start_date'],
+        'end_date': row['end_date']
+    }
+
+async def load_reminders():
+    """Load all reminders, keyed by integer user id"""
+    reminders = {}
+    async with db.execute("SELECT * FROM reminders ORDER BY user_id, id") as cursor:
+        async for row in cursor:
+            reminders.setdefault(row['user_id'], []).append(row_to_reminder(row))
+    return reminders
+
+INSERT_REMINDER = (
+    "INSERT INTO reminders (user_id, task, frequency, time, start_date, end_date, one_off_dt, sent) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+def reminder_row(user_id, reminder):
+    """Column values for inserting a reminder"""
+    return (
+        user_id,
+        reminder['task'],
+        reminder['frequency'],
+        reminder.get('time'),
+        reminder.get('start_date'),
+        reminder.get('end_date'),
+        reminder.get('datetime'),
+        int(reminder.get('sent', False))
+    )
+
+async def add_reminder(user_id, reminder):
+    """Insert a reminder and store its new id on it"""
+    cursor = await db.execute(INSERT_REMINDER, reminder_row(user_id, reminder))
+    await db.commit()
+    reminder['id'] = cursor.lastrowid
+
+async def remove_reminder(reminder):
+    """Delete a reminder"""
+    if 'id' not in reminder:
+        # Never made it into the database
+        return
+    await db.execute("DELETE FROM reminders WHERE id = ?", (reminder['id'],))
+    await db.commit()
+
+async def mark_sent(reminder):
+    """Remember that a one-off reminder has gone out"""
+    await db.execute("UPDATE reminders SET sent = 1 WHERE id = ?", (reminder['id'],))
+    await db.commit()
+
+def load_legacy_json():
+    """Read reminders from the old JSON snapshot and change log"""
+    try:
+        with open(LEGACY_FILE, 'rb') as f:
+            reminders = json.loads(f.read())
+            snapshot_mtime = os.fstat(f.fileno()).st_mtime_ns
+    except FileNotFoundError:
+        reminders = {}
+        snapshot_mtime = None
+    
+    try:
+        with open(LEGACY_LOG, 'rb') as f:
+            log_data = f.read()
+            log_mtime = os.fstat(f.fileno()).st_mtime_ns
+    except FileNotFoundError:
+        log_data = b""
+    
+    # Old versions compacted by replacing the snapshot and only then
+    # truncating the log, and never appended to the log right after that.
+    # A non-empty log that hasn't changed since the snapshot was written was
+    # left behind by a crash in between: it is already in the snapshot, and
+    # replaying it would duplicate adds and apply removes to the wrong rows.
+    if log_data and snapshot_mtime is not None and log_mtime <= snapshot_mtime:
+        log.warning("Ignoring %s, it is older than %s", LEGACY_LOG, LEGACY_FILE)
+        log_data = b""
+    
+    for line in log_data.splitlines():
+        try:
+            event = json.loads(line)
+        except ValueError:
+            # Half-written last line from a crash, nothing after it
+            break
+        user_reminders = reminders.setdefault(str(event['user']), [])
+        if event['op'] == 'add':
+            user_reminders.append(event['reminder'])
+        elif event['op'] in ('remove', 'mark_sent'):
+            if not 0 <= event['index'] < len(user_reminders):
+                # Don't let one bad line stop the bot from starting
+                log.warning("Skipping legacy log event with bad index: %s", event)
+                continue
+            if event['op'] == 'remove':
+                user_reminders.pop(event['index'])
+            else:
+                user_reminders[event['index']]['sent'] = True
+    return reminders
+
+async def import_legacy_json():
+    """Move reminders saved by older versions into the database"""
+    legacy = load_legacy_json()
+    if not legacy:
+        # No old files (or nothing in them)
+        return
+    
+    # Rows already there mean an earlier start imported the files but
+    # died before renaming them; importing again would duplicate reminders
+    async with db.execute("SELECT 1 FROM reminders LIMIT 1") as cursor:
+        already_imported = await cursor.fetchone() is not None
+    
+    if not already_imported:
+        # One transaction, so a crash leaves either everything or nothing
+        rows = [
+            reminder_row(int(user_id), reminder)
+            for user_id, user_reminders in legacy.items()
+            for reminder in user_reminders
+        ]
+        await db.executemany(INSERT_REMINDER, rows)
+        await db.commit()
+    
+    # Keep the old files around, but don't import them again
+    imported_from = []
+    for path in (LEGACY_FILE, LEGACY_LOG):
+        try:
+            os.replace(path, path + '.imported')
+            imported_from.append(path)
+        except FileNotFoundError:
+            pass
+    
+    if not already_imported:
+        log.info("Imported %d reminders from %s", len(rows), ", ".join(imported_from))